@@ -1,8 +1,17 @@
 import os
+import json
 import subprocess
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fractions import Fraction
 from pathlib import Path
 
+# Optional direct NVDEC/NVENC bindings (pip install PyNvVideoCodec)
+try:
+    import PyNvVideoCodec as nvc
+except ImportError:
+    nvc = None
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,42 +22,358 @@ logging.basicConfig(
     ]
 )
 
-def compress_video(input_path, output_path, crf=23):
+# libx264 preset for the software fallback; fast is several times quicker than medium
+# for a small bitrate increase at the same CRF
+X264_PRESET = 'fast'
+
+# Video file extensions processed by default
+VIDEO_EXTS = frozenset({'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm'})
+
+# Containers whose index can be moved to the front of the file with +faststart
+FASTSTART_EXTS = frozenset({'.mp4', '.mov', '.m4v'})
+
+# Keep FFmpeg from printing anything but errors
+FFMPEG_QUIET_ARGS = ['-hide_banner', '-loglevel', 'error', '-nostats']
+
+# Cached results of the FFmpeg capability probes (None until the first check)
+_nvenc_available = None
+_cuda_hwaccel_available = None
+
+def check_nvenc_available():
+    """
+    Check whether NVIDIA's h264_nvenc encoder actually works on this machine by
+    encoding a single test frame. Listing the encoder in 'ffmpeg -encoders' only
+    shows that FFmpeg was built with it, not that a usable GPU is present.
+    The probe runs once and the result is cached for the rest of the run.
+    
+    Returns:
+        bool: True if h264_nvenc is usable, False otherwise
+    """
+    global _nvenc_available
+    if _nvenc_available is None:
+        try:
+            cmd = [
+                'ffmpeg',
+                *FFMPEG_QUIET_ARGS,
+                '-f', 'lavfi',
+                '-i', 'nullsrc',
+                '-frames:v', '1',
+                '-c:v', 'h264_nvenc',
+                '-f', 'null',
+                '-'
+            ]
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            _nvenc_available = result.returncode == 0
+        except Exception as e:
+            logging.warning(f"Could not probe FFmpeg encoders: {str(e)}")
+            _nvenc_available = False
+        
+        if _nvenc_available:
+            logging.info("Using h264_nvenc hardware encoder")
+        else:
+            logging.info("h264_nvenc not available, falling back to libx264")
+    
+    return _nvenc_available
+
+def check_cuda_hwaccel_available():
+    """
+    Check whether the installed FFmpeg build supports CUDA hardware decoding.
+    The probe runs once and the result is cached for the rest of the run.
+    
+    Returns:
+        bool: True if the cuda hwaccel is available, False otherwise
+    """
+    global _cuda_hwaccel_available
+    if _cuda_hwaccel_available is None:
+        try:
+            result = subprocess.run(['ffmpeg', '-hide_banner', '-hwaccels'], capture_output=True, text=True)
+            _cuda_hwaccel_available = result.returncode == 0 and 'cuda' in result.stdout.split()
+        except Exception as e:
+            logging.warning(f"Could not probe FFmpeg hwaccels: {str(e)}")
+            _cuda_hwaccel_available = False
+    
+    return _cuda_hwaccel_available
+
+def scan_directory(directory, rel_path='.'):
+    """
+    Recursively walk a directory tree with os.scandir, whose entries carry
+    file type and size information without an extra stat call per file.
+    Directories that cannot be read are logged and skipped, like os.walk does.
+    
+    Args:
+        directory: Directory to walk
+        rel_path: Path of directory relative to the top of the walk
+        
+    Yields:
+        tuple: (rel_path, file_entries) for every directory in the tree
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry)
+                else:
+                    files.append(entry)
+    except OSError as e:
+        logging.error(f"Could not read directory {directory}: {str(e)}")
+        return
+    
+    yield rel_path, files
+    
+    for entry in subdirs:
+        sub_rel_path = entry.name if rel_path == '.' else os.path.join(rel_path, entry.name)
+        yield from scan_directory(entry.path, sub_rel_path)
+
+def get_muxer_args(output_path):
+    """
+    Build the FFmpeg muxer arguments for an output file. MP4/MOV outputs get
+    +faststart, so players and data loaders can seek without reading the whole file.
+    
+    Args:
+        output_path: Path of the output video file
+    
+    Returns:
+        list: Arguments to place before the output path
+    """
+    if os.path.splitext(str(output_path))[1].lower() in FASTSTART_EXTS:
+        return ['-movflags', '+faststart']
+    return []
+
+def get_encoder_args(crf, software=False):
+    """
+    Build the FFmpeg decoder and encoder arguments for the best available H.264 encoder.
+    
+    Args:
+        crf: Constant Rate Factor (18-28 is good, lower means better quality)
+        software: Use libx264 with software decoding even if NVENC is available
+    
+    Returns:
+        tuple: (input_args, video_args) lists to place before and after -i
+    """
+    input_args = []
+    if not software and check_nvenc_available():
+        if check_cuda_hwaccel_available():
+            # Decode on NVDEC and keep frames in GPU memory so they feed NVENC directly
+            input_args = ['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda']
+        
+        # NVENC constant-quality VBR mode; -cq plays the role of -crf
+        video_args = [
+            '-c:v', 'h264_nvenc',
+            '-preset', 'p4',
+            '-tune', 'hq',
+            '-rc', 'vbr',
+            '-cq', str(crf),
+            '-b:v', '0'
+        ]
+    else:
+        video_args = [
+            '-c:v', 'libx264',
+            '-crf', str(crf),
+            '-preset', X264_PRESET
+        ]
+    
+    return input_args, video_args
+
+def get_constant_frame_rate(input_path):
+    """
+    Get the frame rate of a video that can safely go through PyNvVideoCodec.
+    Its raw H.264 output carries no rotation or timestamps, so rotated and
+    variable frame rate videos have to use FFmpeg instead.
+    
+    Args:
+        input_path: Path to the input video file
+    
+    Returns:
+        str: Frame rate as a fraction (e.g. '30000/1001'), or None if the video
+            is rotated, has a variable frame rate or could not be probed
+    """
+    try:
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_streams',
+            '-of', 'json',
+            str(input_path)
+        ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        
+        if result.returncode != 0:
+            return None
+        
+        streams = json.loads(result.stdout).get('streams', [])
+        if not streams:
+            return None
+        stream = streams[0]
+        
+        # Rotation is stored as a tag by older FFmpeg versions and as a display matrix by newer ones
+        if stream.get('tags', {}).get('rotate', '0') != '0':
+            return None
+        if any(side_data.get('rotation', 0) for side_data in stream.get('side_data_list', [])):
+            return None
+        
+        # A variable frame rate shows up as an average that differs from the base rate
+        frame_rate = stream.get('r_frame_rate', '0/0')
+        average_rate = stream.get('avg_frame_rate', '0/0')
+        if frame_rate.endswith('/0') or average_rate.endswith('/0'):
+            return None
+        if Fraction(frame_rate) != Fraction(average_rate):
+            return None
+        
+        return frame_rate
+    
+    except Exception as e:
+        logging.error(f"Exception while probing {input_path}: {str(e)}")
+        return None
+
+def compress_with_pynvvideocodec(input_path, output_path, crf=23):
     """
-    Compress a video using FFmpeg with H.264 codec.
+    Compress a video with PyNvVideoCodec, passing frames straight from NVDEC to NVENC.
+    FFmpeg is only used to mux the resulting H.264 stream with the re-encoded audio.
+    Only 8-bit, unrotated, constant frame rate sources are supported.
     
     Args:
         input_path: Path to the input video file
         output_path: Path to save the compressed video
-        crf: Constant Rate Factor (18-28 is good, lower means better quality)
+        crf: Constant quality level for NVENC (same scale as the CRF)
     
     Returns:
         bool: True if compression was successful, False otherwise
     """
     try:
-        # Create command for FFmpeg
+        frame_rate = get_constant_frame_rate(input_path)
+        if frame_rate is None:
+            logging.info(f"{input_path} is rotated, has a variable frame rate or could not be probed, using FFmpeg instead")
+            return False
+        
+        demuxer = nvc.CreateDemuxer(filename=str(input_path))
+        if demuxer.BitDepth() != 8:
+            return False
+        
+        decoder = nvc.CreateDecoder(gpuid=0, codec=demuxer.GetNvCodecId(), cudacontext=0,
+                                    cudastream=0, usedevicememory=True)
+        encoder = nvc.CreateEncoder(demuxer.Width(), demuxer.Height(), 'NV12', False,
+                                    codec='h264', preset='P4', tuning_info='high_quality',
+                                    rc='vbr', cq=str(crf), fps=str(demuxer.FrameRate()))
+        
+        # Mux the raw H.264 stream from stdin with the audio of the original file
         cmd = [
             'ffmpeg',
+            *FFMPEG_QUIET_ARGS,
+            '-f', 'h264',
+            '-framerate', frame_rate,
+            '-i', '-',
             '-i', str(input_path),
-            '-c:v', 'libx264',
-            '-crf', str(crf),
-            '-preset', 'medium',
+            '-map', '0:v',
+            '-map', '1:a:0?',  # Not every video has an audio track
+            '-c:v', 'copy',
             '-c:a', 'aac',
             '-b:a', '128k',
+            *get_muxer_args(output_path),
             str(output_path),
             '-y'  # Overwrite output file if it exists
         ]
+        muxer = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         
-        # Run the command
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        try:
+            for packet in demuxer:
+                for frame in decoder.Decode(packet):
+                    muxer.stdin.write(bytes(encoder.Encode(frame)))
+            muxer.stdin.write(bytes(encoder.EndEncode()))
+        finally:
+            _, stderr = muxer.communicate()
         
-        # Check if the command was successful
-        if result.returncode != 0:
-            logging.error(f"Error compressing {input_path}: {result.stderr}")
+        if muxer.returncode != 0:
+            logging.error(f"Error muxing {input_path}: {stderr.decode(errors='replace')}")
+            return False
+        
+        return True
+    
+    except Exception as e:
+        logging.warning(f"PyNvVideoCodec could not compress {input_path}, using FFmpeg instead: {str(e)}")
+        return False
+
+def compress_with_ffmpeg(input_path, output_path, crf=23):
+    """
+    Compress a video with FFmpeg, using NVENC when available and libx264 otherwise.
+    A failed NVENC encode (e.g. a 10-bit source or too many concurrent sessions)
+    is retried once with libx264.
+    
+    Args:
+        input_path: Path to the input video file
+        output_path: Path to save the compressed video
+        crf: Constant Rate Factor (18-28 is good, lower means better quality)
+    
+    Returns:
+        bool: True if compression was successful, False otherwise
+    """
+    try:
+        software = not check_nvenc_available()
+        
+        while True:
+            # Create command for FFmpeg
+            input_args, video_args = get_encoder_args(crf, software)
+            
+            cmd = [
+                'ffmpeg',
+                *FFMPEG_QUIET_ARGS,
+                *input_args,
+                '-i', str(input_path),
+                *video_args,
+                '-c:a', 'aac',
+                '-b:a', '128k',
+                *get_muxer_args(output_path),
+                str(output_path),
+                '-y'  # Overwrite output file if it exists
+            ]
+            
+            # Run the command, keeping only stderr for error reporting
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            
+            # Check if the command was successful
+            if result.returncode == 0:
+                return True
+            
+            if software:
+                logging.error(f"Error compressing {input_path}: {result.stderr.decode(errors='replace')}")
+                return False
+            
+            logging.warning(f"NVENC failed for {input_path}, retrying with libx264: {result.stderr.decode(errors='replace')}")
+            software = True
+    
+    except Exception as e:
+        logging.error(f"Exception while compressing {input_path}: {str(e)}")
+        return False
+
+def compress_video(input_path, output_path, crf=23, input_size=None, use_pynvvideocodec=False):
+    """
+    Compress a video with H.264 codec.
+    Uses FFmpeg, or PyNvVideoCodec if enabled and installed, falling back to FFmpeg if it fails.
+    
+    Args:
+        input_path: Path to the input video file
+        output_path: Path to save the compressed video
+        crf: Constant Rate Factor (18-28 is good, lower means better quality)
+        input_size: Size of the input file in bytes, read from disk if not given
+        use_pynvvideocodec: Try the experimental PyNvVideoCodec pipeline first
+    
+    Returns:
+        bool: True if compression was successful, False otherwise
+    """
+    try:
+        compressed = (use_pynvvideocodec and nvc is not None
+                      and compress_with_pynvvideocodec(input_path, output_path, crf))
+        
+        if not compressed and not compress_with_ffmpeg(input_path, output_path, crf):
             return False
         
         # Get file sizes for logging
-        input_size = os.path.getsize(input_path) / (1024 * 1024)  # MB
+        if input_size is None:
+            input_size = os.path.getsize(input_path)
+        input_size = input_size / (1024 * 1024)  # MB
         output_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
         compression_ratio = (1 - (output_size / input_size)) * 100
         
@@ -61,7 +386,93 @@ def compress_video(input_path, output_path, crf=23):
         logging.error(f"Exception while compressing {input_path}: {str(e)}")
         return False
 
-def process_directory(base_dir, output_dir=None, video_extensions=None, crf=23):
+def compress_video_variants(input_path, variants, input_size=None):
+    """
+    Compress a video into several resolutions with a single FFmpeg invocation.
+    The input is decoded once and split into one scaler and encoder per variant,
+    instead of decoding it again for every output. Like compress_with_ffmpeg,
+    a failed GPU attempt (e.g. a codec NVDEC cannot decode, leaving frames in
+    system memory where scale_cuda cannot read them) is retried once with
+    software decoding, the scale filter and libx264.
+    
+    Args:
+        input_path: Path to the input video file
+        variants: List of (output_path, crf, width, height) tuples
+        input_size: Size of the input file in bytes, read from disk if not given
+    
+    Returns:
+        bool: True if every variant was compressed successfully, False otherwise
+    """
+    try:
+        software = not check_nvenc_available()
+        
+        while True:
+            input_args, _ = get_encoder_args(variants[0][1], software)
+            
+            # Frames decoded on the GPU have to be scaled there as well
+            scale_filter = 'scale_cuda' if input_args else 'scale'
+            
+            # Split the decoded video into one scaled stream per variant
+            split_outputs = ''.join(f'[split{index}]' for index in range(len(variants)))
+            filters = [f'[0:v]split={len(variants)}{split_outputs}']
+            for index, (_, _, width, height) in enumerate(variants):
+                filters.append(f'[split{index}]{scale_filter}={width}:{height}[video{index}]')
+            
+            cmd = [
+                'ffmpeg',
+                *FFMPEG_QUIET_ARGS,
+                *input_args,
+                '-i', str(input_path),
+                '-filter_complex', ';'.join(filters)
+            ]
+            
+            for index, (output_path, crf, _, _) in enumerate(variants):
+                _, video_args = get_encoder_args(crf, software)
+                cmd += [
+                    '-map', f'[video{index}]',
+                    '-map', '0:a:0?',  # Not every video has an audio track
+                    *video_args,
+                    '-c:a', 'aac',
+                    '-b:a', '128k',
+                    *get_muxer_args(output_path),
+                    str(output_path)
+                ]
+            
+            cmd.append('-y')  # Overwrite output files if they exist
+            
+            # Run the command, keeping only stderr for error reporting
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            
+            # Check if the command was successful
+            if result.returncode == 0:
+                break
+            
+            if software:
+                logging.error(f"Error compressing {input_path}: {result.stderr.decode(errors='replace')}")
+                return False
+            
+            logging.warning(f"GPU pipeline failed for {input_path}, retrying with libx264: {result.stderr.decode(errors='replace')}")
+            software = True
+        
+        # Get file sizes for logging
+        if input_size is None:
+            input_size = os.path.getsize(input_path)
+        input_size = input_size / (1024 * 1024)  # MB
+        
+        logging.info(f"Compressed {input_path} into {len(variants)} variants")
+        for output_path, _, width, height in variants:
+            output_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+            compression_ratio = (1 - (output_size / input_size)) * 100
+            logging.info(f"{width}x{height}: Original: {input_size:.2f}MB, Compressed: {output_size:.2f}MB, Saved: {compression_ratio:.2f}%")
+        
+        return True
+    
+    except Exception as e:
+        logging.error(f"Exception while compressing {input_path}: {str(e)}")
+        return False
+
+def process_directory(base_dir, output_dir=None, video_extensions=None, crf=23, max_workers=None,
+                      use_pynvvideocodec=False, resolutions=None):
     """
     Process all video files in the directory structure.
     
@@ -70,59 +481,96 @@ def process_directory(base_dir, output_dir=None, video_extensions=None, crf=23):
         output_dir: Directory to save compressed videos (creates similar structure)
         video_extensions: List of video file extensions to process
         crf: Compression quality factor
+        max_workers: Number of concurrent FFmpeg processes (defaults to 3 with
+            NVENC, which consumer GPUs cap on concurrent sessions, else the CPU count)
+        use_pynvvideocodec: Try the experimental PyNvVideoCodec pipeline first
+        resolutions: Optional list of (width, height) tuples; if given, every video
+            is compressed into one file per resolution, named e.g. clip_1280x720.mp4
     """
     if video_extensions is None:
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm']
+        video_extensions = VIDEO_EXTS
+    else:
+        video_extensions = frozenset(ext.lower() for ext in video_extensions)
     
     # If output_dir is not provided, create a "compressed" folder next to base_dir
     if output_dir is None:
         base_path = Path(base_dir)
         output_dir = base_path.parent / f"{base_path.name}_compressed"
     
-    base_dir_path = Path(base_dir)
-    output_dir_path = Path(output_dir)
+    # Work with plain string paths from here on
+    output_dir = os.fspath(output_dir)
     
     # Create the output directory if it doesn't exist
-    if not output_dir_path.exists():
-        output_dir_path.mkdir(parents=True)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    if max_workers is None:
+        uses_nvenc = check_nvenc_available() or (use_pynvvideocodec and nvc is not None)
+        max_workers = 3 if uses_nvenc else (os.cpu_count() or 1)
+    
+    # Walk through the directory structure and create the whole output tree
+    # up front, so directory creation never interleaves with the FFmpeg jobs
+    directories = list(scan_directory(base_dir))
+    for rel_path, _ in directories:
+        if rel_path != '.':
+            os.makedirs(os.path.join(output_dir, rel_path), exist_ok=True)
     
-    # Walk through the directory structure
     total_videos = 0
     compressed_videos = 0
     total_saved_mb = 0
     
-    for root, dirs, files in os.walk(base_dir):
-        # Get the relative path from the base directory
-        rel_path = os.path.relpath(root, base_dir)
+    # Each worker only waits on an FFmpeg subprocess, so threads are enough to keep them all busy
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
         
-        # Create the corresponding output directory
-        if rel_path != '.':
-            current_output_dir = output_dir_path / rel_path
-            if not current_output_dir.exists():
-                current_output_dir.mkdir(parents=True)
-        else:
-            current_output_dir = output_dir_path
-        
-        # Process video files
-        for file in files:
-            if any(file.lower().endswith(ext) for ext in video_extensions):
-                total_videos += 1
-                input_file = Path(root) / file
-                output_file = current_output_dir / file
-                
-                # Get original size
-                original_size = os.path.getsize(input_file) / (1024 * 1024)  # MB
-                
-                # Compress the video
-                logging.info(f"Processing {input_file}")
-                success = compress_video(input_file, output_file, crf)
-                
-                if success:
-                    compressed_videos += 1
-                    # Calculate space saved
-                    new_size = os.path.getsize(output_file) / (1024 * 1024)  # MB
-                    saved_mb = original_size - new_size
-                    total_saved_mb += saved_mb
+        for rel_path, entries in directories:
+            # Get the corresponding output directory
+            if rel_path != '.':
+                current_output_dir = os.path.join(output_dir, rel_path)
+            else:
+                current_output_dir = output_dir
+            
+            # Queue video files for compression
+            for entry in entries:
+                file = entry.name
+                if os.path.splitext(file)[1].lower() in video_extensions:
+                    total_videos += 1
+                    input_file = entry.path
+                    output_file = os.path.join(current_output_dir, file)
+                    
+                    # Get original size from the directory entry; a broken symlink
+                    # or a file removed since the scan is logged and skipped
+                    try:
+                        input_size = entry.stat().st_size
+                    except OSError as e:
+                        logging.error(f"Could not read {input_file}: {str(e)}")
+                        continue
+                    original_size = input_size / (1024 * 1024)  # MB
+                    
+                    logging.info(f"Processing {input_file}")
+                    if resolutions:
+                        # Decode once and encode every resolution in the same FFmpeg process
+                        stem, ext = os.path.splitext(file)
+                        variants = [
+                            (os.path.join(current_output_dir, f"{stem}_{width}x{height}{ext}"), crf, width, height)
+                            for width, height in resolutions
+                        ]
+                        future = pool.submit(compress_video_variants, input_file, variants, input_size)
+                        futures[future] = ([variant[0] for variant in variants], original_size)
+                    else:
+                        future = pool.submit(compress_video, input_file, output_file, crf, input_size,
+                                             use_pynvvideocodec)
+                        futures[future] = ([output_file], original_size)
+        
+        # Collect results as the compressions finish
+        for future in as_completed(futures):
+            output_files, original_size = futures[future]
+            
+            if future.result():
+                compressed_videos += 1
+                # Calculate space saved
+                new_size = sum(os.path.getsize(output_file) for output_file in output_files) / (1024 * 1024)  # MB
+                saved_mb = original_size - new_size
+                total_saved_mb += saved_mb
     
     # Log summary
     logging.info(f"Compression complete. Processed {compressed_videos}/{total_videos} videos.")
@@ -133,7 +581,10 @@ if __name__ == "__main__":
     BASE_DIR = "D:\Capstone\data\downloaded_videos"  # Path to the folder containing videos
     OUTPUT_DIR = "D:\Capstone\data\compressed_videos"  # Where to save compressed videos
     COMPRESSION_QUALITY = 35  # CRF value (18-28 recommended, lower is better quality)
+    USE_PYNVVIDEOCODEC = False  # Experimental direct NVDEC/NVENC pipeline (needs PyNvVideoCodec)
+    RESOLUTIONS = None  # e.g. [(1280, 720), (640, 360)] to write one file per resolution
     
     logging.info("Starting video compression process")
-    process_directory(BASE_DIR, OUTPUT_DIR, crf=COMPRESSION_QUALITY)
+    process_directory(BASE_DIR, OUTPUT_DIR, crf=COMPRESSION_QUALITY, use_pynvvideocodec=USE_PYNVVIDEOCODEC,
+                      resolutions=RESOLUTIONS)
     logging.info("Process completed")
@@ -1,8 +1,24 @@
 import os
+import re
+import shutil
 import subprocess
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+# Number of videos cropped by a single FFmpeg invocation
+BATCH_SIZE = 16
+
+# Video file extensions processed by default
+VIDEO_EXTS = frozenset({'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm'})
+
+# Keep FFmpeg from printing anything but errors
+FFMPEG_QUIET_ARGS = ['-hide_banner', '-loglevel', 'error', '-nostats']
+
+# Lines of the input summary FFmpeg prints to stderr
+INPUT_LINE_RE = re.compile(r'^Input #(\d+),')
+DURATION_LINE_RE = re.compile(r'^\s+Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -45,7 +61,126 @@ def get_video_duration(video_path):
         logging.error(f"Exception while getting duration for {video_path}: {str(e)}")
         return None
 
-def crop_video(input_path, output_path, max_duration=7):
+def get_video_durations(video_paths):
+    """
+    Get the durations of several videos with a single FFmpeg call by parsing the
+    input summary it prints, instead of running FFprobe once per video.
+    Videos FFmpeg did not report on are retried individually with FFprobe.
+    
+    Args:
+        video_paths: List of video file paths
+        
+    Returns:
+        list: Duration in seconds for each video, None where it could not be read
+    """
+    durations = [None] * len(video_paths)
+    
+    try:
+        cmd = ['ffmpeg', '-hide_banner']
+        for video_path in video_paths:
+            cmd += ['-i', str(video_path)]
+        
+        # No output is given, so FFmpeg exits right after describing the inputs
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        
+        current_input = None
+        for line in result.stderr.splitlines():
+            match = INPUT_LINE_RE.match(line)
+            if match:
+                current_input = int(match.group(1))
+                continue
+            
+            match = DURATION_LINE_RE.match(line)
+            if match and current_input is not None:
+                hours, minutes, seconds = match.groups()
+                durations[current_input] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    except Exception as e:
+        logging.error(f"Exception while getting durations for batch of {len(video_paths)} videos: {str(e)}")
+    
+    # FFmpeg stops at the first input it cannot open, so probe the rest one by one
+    for index, video_path in enumerate(video_paths):
+        if durations[index] is None:
+            durations[index] = get_video_duration(video_path)
+    
+    return durations
+
+def get_stream_map_args(input_index):
+    """
+    Build the FFmpeg stream selection for one input, so single and batched
+    crops keep the same streams: the first video and, if present, the first audio.
+    
+    Args:
+        input_index: Index of the input in the FFmpeg command
+        
+    Returns:
+        list: -map arguments for the output of that input
+    """
+    return [
+        '-map', f'{input_index}:v:0',
+        '-map', f'{input_index}:a:0?'  # Not every video has an audio track
+    ]
+
+def copy_video(input_path, output_path):
+    """
+    Copy a video that needs no cropping without running FFmpeg.
+    Hard links the file when possible, so no data is copied at all, and
+    falls back to a regular copy (e.g. across filesystems).
+    
+    Args:
+        input_path: Path to the input video file
+        output_path: Path to save the copy
+        
+    Returns:
+        bool: True if the copy was successful, False otherwise
+    """
+    try:
+        try:
+            os.link(input_path, output_path)
+        except OSError:
+            try:
+                shutil.copyfile(input_path, output_path)
+            except shutil.SameFileError:
+                pass  # Already linked by a previous run
+        return True
+    
+    except Exception as e:
+        logging.error(f"Exception while copying {input_path}: {str(e)}")
+        return False
+
+def scan_directory(directory, rel_path='.'):
+    """
+    Recursively walk a directory tree with os.scandir, whose entries carry
+    file type and size information without an extra stat call per file.
+    Directories that cannot be read are logged and skipped, like os.walk does.
+    
+    Args:
+        directory: Directory to walk
+        rel_path: Path of directory relative to the top of the walk
+        
+    Yields:
+        tuple: (rel_path, file_entries) for every directory in the tree
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry)
+                else:
+                    files.append(entry)
+    except OSError as e:
+        logging.error(f"Could not read directory {directory}: {str(e)}")
+        return
+    
+    yield rel_path, files
+    
+    for entry in subdirs:
+        sub_rel_path = entry.name if rel_path == '.' else os.path.join(rel_path, entry.name)
+        yield from scan_directory(entry.path, sub_rel_path)
+
+def crop_video(input_path, output_path, max_duration=7, duration=None, input_size=None):
     """
     Crop a video to specified duration if it's longer than that duration.
     
@@ -53,64 +188,155 @@ def crop_video(input_path, output_path, max_duration=7):
         input_path: Path to the input video file
         output_path: Path to save the cropped video
         max_duration: Maximum duration in seconds
+        duration: Duration of the input in seconds, probed with FFprobe if not given
+        input_size: Size of the input file in bytes, read from disk if not given
         
     Returns:
         bool: True if cropping was successful, False otherwise
     """
     try:
         # First check the video duration
-        duration = get_video_duration(input_path)
+        if duration is None:
+            duration = get_video_duration(input_path)
         
         if duration is None:
             return False
             
-        # If video is shorter than or equal to max_duration, just copy it
+        # If video is shorter than or equal to max_duration, just copy the file
         if duration <= max_duration:
             logging.info(f"Video {input_path} is already shorter than {max_duration} seconds ({duration:.2f}s). Copying.")
-            cmd = [
-                'ffmpeg',
-                '-i', str(input_path),
-                '-c', 'copy',
-                str(output_path),
-                '-y'  # Overwrite output file if it exists
-            ]
-        else:
-            # Crop the video to max_duration
-            logging.info(f"Cropping {input_path} from {duration:.2f}s to {max_duration}s")
-            cmd = [
-                'ffmpeg',
-                '-i', str(input_path),
-                '-t', str(max_duration),
-                '-c:v', 'copy',  # Copy video codec to avoid re-encoding
-                '-c:a', 'copy',  # Copy audio codec to avoid re-encoding
-                str(output_path),
-                '-y'  # Overwrite output file if it exists
+            return copy_video(input_path, output_path)
+        
+        # Crop the video to max_duration
+        logging.info(f"Cropping {input_path} from {duration:.2f}s to {max_duration}s")
+        cmd = [
+            'ffmpeg',
+            *FFMPEG_QUIET_ARGS,
+            '-t', str(max_duration),  # Input-side limit, so demuxing stops at max_duration
+            '-i', str(input_path),
+            *get_stream_map_args(0),
+            '-c', 'copy',  # Copy the selected streams to avoid re-encoding
+            '-avoid_negative_ts', 'make_zero',
+            str(output_path),
+            '-y'  # Overwrite output file if it exists
+        ]
+        
+        # Run the command, keeping only stderr for error reporting
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        
+        # Check if the command was successful
+        if result.returncode != 0:
+            logging.error(f"Error processing {input_path}: {result.stderr.decode(errors='replace')}")
+            return False
+        
+        # Get file sizes for logging
+        if input_size is None:
+            input_size = os.path.getsize(input_path)
+        input_size = input_size / (1024 * 1024)  # MB
+        output_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+        size_reduction = (1 - (output_size / input_size)) * 100
+        
+        logging.info(f"Cropped {input_path}")
+        logging.info(f"Original: {input_size:.2f}MB, Cropped: {output_size:.2f}MB, Reduced by: {size_reduction:.2f}%")
+        
+        return True
+    
+    except Exception as e:
+        logging.error(f"Exception while processing {input_path}: {str(e)}")
+        return False
+
+def crop_videos_batch(jobs, max_duration=7):
+    """
+    Crop several videos to the specified duration with a single FFmpeg invocation,
+    saving the process startup cost of running FFmpeg once per file.
+    
+    Args:
+        jobs: List of (input_path, output_path, duration, input_size) tuples
+        max_duration: Maximum duration in seconds
+        
+    Returns:
+        bool: True if every video in the batch was processed, False otherwise
+    """
+    try:
+        cmd = ['ffmpeg', *FFMPEG_QUIET_ARGS, '-y']  # Overwrite output files if they exist
+        for input_path, _, _, _ in jobs:
+            # Input-side limit, so demuxing stops at max_duration
+            cmd += ['-t', str(max_duration), '-i', str(input_path)]
+        
+        # One output per input, each mapped to its own input's streams
+        for index, (_, output_path, _, _) in enumerate(jobs):
+            cmd += [
+                *get_stream_map_args(index),
+                '-c', 'copy',  # Copy the selected streams to avoid re-encoding
+                '-avoid_negative_ts', 'make_zero',
+                str(output_path)
             ]
         
-        # Run the command
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # Run the command, keeping only stderr for error reporting
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         
         # Check if the command was successful
         if result.returncode != 0:
-            logging.error(f"Error processing {input_path}: {result.stderr}")
+            logging.error(f"Error processing batch of {len(jobs)} videos: {result.stderr.decode(errors='replace')}")
             return False
         
-        if duration > max_duration:
+        for input_path, output_path, duration, input_size in jobs:
             # Get file sizes for logging
-            input_size = os.path.getsize(input_path) / (1024 * 1024)  # MB
+            input_size = input_size / (1024 * 1024)  # MB
             output_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
             size_reduction = (1 - (output_size / input_size)) * 100
             
-            logging.info(f"Cropped {input_path}")
+            logging.info(f"Cropped {input_path} from {duration:.2f}s to {max_duration}s")
             logging.info(f"Original: {input_size:.2f}MB, Cropped: {output_size:.2f}MB, Reduced by: {size_reduction:.2f}%")
         
         return True
     
     except Exception as e:
-        logging.error(f"Exception while processing {input_path}: {str(e)}")
+        logging.error(f"Exception while processing batch of {len(jobs)} videos: {str(e)}")
         return False
 
-def process_directory(base_dir, output_dir=None, video_extensions=None, max_duration=7):
+def process_batch(jobs, max_duration=7):
+    """
+    Check the durations of a batch of videos, copy the short ones and crop
+    the rest together. If the batched FFmpeg call fails, the videos are retried
+    one at a time so a single broken file does not fail the rest of the batch.
+    
+    Args:
+        jobs: List of (input_path, output_path, input_size) tuples
+        max_duration: Maximum duration in seconds
+        
+    Returns:
+        tuple: (processed, cropped) video counts for the batch
+    """
+    processed = 0
+    to_crop = []
+    durations = get_video_durations([job[0] for job in jobs])
+    
+    for (input_path, output_path, input_size), duration in zip(jobs, durations):
+        if duration is None:
+            continue
+        
+        if duration <= max_duration:
+            logging.info(f"Video {input_path} is already shorter than {max_duration} seconds ({duration:.2f}s). Copying.")
+            if copy_video(input_path, output_path):
+                processed += 1
+        else:
+            to_crop.append((input_path, output_path, duration, input_size))
+    
+    if not to_crop:
+        return processed, 0
+    
+    if crop_videos_batch(to_crop, max_duration):
+        cropped = len(to_crop)
+    else:
+        cropped = sum(
+            1 for input_path, output_path, duration, input_size in to_crop
+            if crop_video(input_path, output_path, max_duration, duration, input_size)
+        )
+    
+    return processed + cropped, cropped
+
+def process_directory(base_dir, output_dir=None, video_extensions=None, max_duration=7, max_workers=None):
     """
     Process all video files in the directory structure.
     
@@ -119,59 +345,77 @@ def process_directory(base_dir, output_dir=None, video_extensions=None, max_dura
         output_dir: Directory to save cropped videos (creates similar structure)
         video_extensions: List of video file extensions to process
         max_duration: Maximum duration in seconds
+        max_workers: Number of concurrent FFmpeg processes (defaults to the CPU count)
     """
     if video_extensions is None:
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm']
+        video_extensions = VIDEO_EXTS
+    else:
+        video_extensions = frozenset(ext.lower() for ext in video_extensions)
     
     # If output_dir is not provided, create a "cropped" folder next to base_dir
     if output_dir is None:
         base_path = Path(base_dir)
         output_dir = base_path.parent / f"{base_path.name}_cropped"
     
-    base_dir_path = Path(base_dir)
-    output_dir_path = Path(output_dir)
+    # Work with plain string paths from here on
+    output_dir = os.fspath(output_dir)
     
     # Create the output directory if it doesn't exist
-    if not output_dir_path.exists():
-        output_dir_path.mkdir(parents=True)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    
+    # Walk through the directory structure and create the whole output tree
+    # up front, so directory creation never interleaves with the FFmpeg jobs
+    directories = list(scan_directory(base_dir))
+    for rel_path, _ in directories:
+        if rel_path != '.':
+            os.makedirs(os.path.join(output_dir, rel_path), exist_ok=True)
     
-    # Walk through the directory structure
     total_videos = 0
     processed_videos = 0
     cropped_videos = 0
     
-    for root, dirs, files in os.walk(base_dir):
-        # Get the relative path from the base directory
-        rel_path = os.path.relpath(root, base_dir)
+    # Each worker only waits on FFprobe/FFmpeg subprocesses, so threads are enough to keep them all busy
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
         
-        # Create the corresponding output directory
-        if rel_path != '.':
-            current_output_dir = output_dir_path / rel_path
-            if not current_output_dir.exists():
-                current_output_dir.mkdir(parents=True)
-        else:
-            current_output_dir = output_dir_path
-        
-        # Process video files
-        for file in files:
-            if any(file.lower().endswith(ext) for ext in video_extensions):
-                total_videos += 1
-                input_file = Path(root) / file
-                output_file = current_output_dir / file
-                
-                # Check duration and crop if necessary
-                logging.info(f"Processing {input_file}")
-                duration = get_video_duration(input_file)
-                
-                if duration is None:
-                    continue
+        for rel_path, entries in directories:
+            # Get the corresponding output directory
+            if rel_path != '.':
+                current_output_dir = os.path.join(output_dir, rel_path)
+            else:
+                current_output_dir = output_dir
+            
+            # Collect the video files of this directory, with sizes from the directory entries
+            jobs = []
+            for entry in entries:
+                file = entry.name
+                if os.path.splitext(file)[1].lower() in video_extensions:
+                    total_videos += 1
+                    input_file = entry.path
+                    output_file = os.path.join(current_output_dir, file)
                     
-                success = crop_video(input_file, output_file, max_duration)
-                
-                if success:
-                    processed_videos += 1
-                    if duration > max_duration:
-                        cropped_videos += 1
+                    # A broken symlink or a file removed since the scan is logged and skipped
+                    try:
+                        input_size = entry.stat().st_size
+                    except OSError as e:
+                        logging.error(f"Could not read {input_file}: {str(e)}")
+                        continue
+                    
+                    logging.info(f"Processing {input_file}")
+                    jobs.append((input_file, output_file, input_size))
+            
+            # Queue them in batches for duration check and cropping
+            for start in range(0, len(jobs), BATCH_SIZE):
+                futures.append(pool.submit(process_batch, jobs[start:start + BATCH_SIZE], max_duration))
+        
+        # Collect results as the batches finish
+        for future in as_completed(futures):
+            processed, cropped = future.result()
+            processed_videos += processed
+            cropped_videos += cropped
     
     # Log summary
     logging.info(f"Processing complete.")
@@ -2,67 +2,165 @@ import pandas as pd
 import os
 import requests
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
-import io
+
+# Download chunk size; the library default of 100 KB needs many more round trips
+DOWNLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Number of videos downloaded concurrently
+MAX_DOWNLOAD_WORKERS = 8
+
+# Per-thread Google Drive API clients
+_thread_local = threading.local()
+
+# Output paths already taken by a download in this run
+_claimed_paths = set()
+_claimed_paths_lock = threading.Lock()
+
+# File ID in /d/, /file/d/ and id= style Google Drive links
+FILE_ID_RE = re.compile(r'(?:/d/|id=)([a-zA-Z0-9_-]+)')
+
+# Characters not allowed in folder names
+INVALID_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
 
 def extract_file_id(drive_link):
     """Extract the file ID from various formats of Google Drive links"""
-    patterns = [
-        r'\/d\/([a-zA-Z0-9-_]+)',  # /d/ format
-        r'id=([a-zA-Z0-9-_]+)',    # id= format
-        r'\/file\/d\/([a-zA-Z0-9-_]+)'  # /file/d/ format
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, drive_link)
-        if match:
-            return match.group(1)
-    return None
-
-def setup_drive_service():
-    """Set up and authenticate Google Drive API"""
+    match = FILE_ID_RE.search(drive_link)
+    return match.group(1) if match else None
+
+def get_credentials():
+    """Authenticate with Google and return credentials for the Drive API.
+    The token is cached in token.json, so the browser sign-in is only needed on the first run."""
     SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+    TOKEN_FILE = 'token.json'
     
-    flow = InstalledAppFlow.from_client_secrets_file(
-        'credentials.json', SCOPES)
-    creds = flow.run_local_server(port=0)
+    creds = None
+    if os.path.exists(TOKEN_FILE):
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
     
-    return build('drive', 'v3', credentials=creds)
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+            except RefreshError as e:
+                # The refresh token was revoked or has expired, so sign in again
+                print(f"Could not refresh saved token, signing in again: {str(e)}")
+                creds = None
+        
+        if not creds or not creds.valid:
+            flow = InstalledAppFlow.from_client_secrets_file(
+                'credentials.json', SCOPES)
+            creds = flow.run_local_server(port=0)
+        
+        # Save the token for the next run
+        with open(TOKEN_FILE, 'w') as token:
+            token.write(creds.to_json())
+    
+    return creds
+
+def setup_drive_service(creds):
+    """Set up a Google Drive API client for the given credentials"""
+    return build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+def get_thread_service(creds):
+    """Get the Google Drive API client of the current thread, creating it on first use.
+    The client's HTTP transport is not thread-safe, so each worker thread needs its own."""
+    if not hasattr(_thread_local, 'service'):
+        _thread_local.service = setup_drive_service(creds)
+    return _thread_local.service
 
 def sanitize_folder_name(name):
     """Remove invalid characters from folder names"""
     # Replace invalid characters with underscore
-    invalid_chars = r'[<>:"/\\|?*]'
-    return re.sub(invalid_chars, '_', str(name))
+    return INVALID_CHARS_RE.sub('_', str(name))
 
 def download_video(service, file_id, output_path):
     """Download a video file from Google Drive"""
     try:
         request = service.files().get_media(fileId=file_id)
-        file = io.BytesIO()
-        downloader = MediaIoBaseDownload(file, request)
-        done = False
         
-        print(f"Downloading to {output_path}")
-        while not done:
-            status, done = downloader.next_chunk()
-            print(f"Download Progress: {int(status.progress() * 100)}%")
+        # Write chunks straight to disk instead of buffering the whole video in memory
+        with open(output_path, 'wb') as file:
+            downloader = MediaIoBaseDownload(file, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+            done = False
             
-        file.seek(0)
-        with open(output_path, 'wb') as f:
-            f.write(file.read())
+            print(f"Downloading to {output_path}")
+            while not done:
+                status, done = downloader.next_chunk()
+                print(f"Download Progress: {int(status.progress() * 100)}%")
+        
         return True
     except Exception as e:
         print(f"Error downloading file: {str(e)}")
+        # Don't leave a partially downloaded video behind
+        if os.path.exists(output_path):
+            os.remove(output_path)
         return False
 
+def claim_output_path(folder_path, filename):
+    """Reserve a path for a download, so two Drive files with the same name never write to the same file.
+    Later files get a numbered name like 'clip (1).mp4'."""
+    base, ext = os.path.splitext(filename)
+    output_path = os.path.join(folder_path, filename)
+    counter = 1
+    with _claimed_paths_lock:
+        while output_path in _claimed_paths:
+            output_path = os.path.join(folder_path, f"{base} ({counter}){ext}")
+            counter += 1
+        _claimed_paths.add(output_path)
+    return output_path
+
+def download_to_folder(creds, video_name, file_id, folder_path):
+    """Download a Google Drive video into its folder, keeping the original filename"""
+    try:
+        service = get_thread_service(creds)
+        
+        # Get file metadata to determine original filename
+        file_metadata = service.files().get(fileId=file_id, fields='name').execute()
+        original_filename = file_metadata['name']
+        
+        # Create full output path, renamed if another download in this run already uses it
+        output_path = claim_output_path(folder_path, original_filename)
+        
+        # Download the video
+        print(f"\nProcessing video: {video_name}")
+        if download_video(service, file_id, output_path):
+            print(f"Successfully downloaded {os.path.basename(output_path)} to {folder_path}")
+        else:
+            print(f"Failed to download video for {video_name}")
+            
+    except Exception as e:
+        print(f"Error processing {video_name}: {str(e)}")
+
+def load_dataset(excel_path):
+    """Load the video list from the Excel file, using a Parquet copy once it has been converted.
+    The Parquet file is rebuilt whenever the Excel file is newer."""
+    parquet_path = os.path.splitext(excel_path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(excel_path):
+        return pd.read_parquet(parquet_path)
+    
+    # Only parse the columns we need, as plain strings
+    df = pd.read_excel(excel_path, usecols=lambda column: column in ('video_name', 'Download'),
+                       engine='openpyxl', dtype=str)
+    
+    try:
+        df.to_parquet(parquet_path)
+    except Exception as e:
+        print(f"Could not cache dataset as Parquet: {str(e)}")
+    
+    return df
+
 def process_videos():
     # Read the Excel file
     try:
-        df = pd.read_excel('dataset.xlsx')  # Replace with your Excel file name
+        df = load_dataset('dataset.xlsx')  # Replace with your Excel file name
     except Exception as e:
         print(f"Error reading Excel file: {str(e)}")
         return
@@ -72,9 +170,9 @@ def process_videos():
         print("Error: Required columns 'video_name' and 'Download' not found in Excel file")
         return
 
-    # Set up Google Drive service
+    # Authenticate with Google Drive
     try:
-        service = setup_drive_service()
+        creds = get_credentials()
     except Exception as e:
         print(f"Error setting up Google Drive service: {str(e)}")
         return
@@ -83,43 +181,40 @@ def process_videos():
     base_dir = 'downloaded_videos'
     os.makedirs(base_dir, exist_ok=True)
 
-    # Process each row
-    for index, row in df.iterrows():
-        video_name = sanitize_folder_name(row['video_name'])
-        drive_link = row['Download']
+    # Skip rows where any required field is empty
+    missing = df['video_name'].isna() | df['Download'].isna()
+    for index in df.index[missing]:
+        print(f"Skipping row {index + 2}: Missing required information")
+    df = df[~missing].copy()
 
-        # Skip if any required field is empty
-        if pd.isna(video_name) or pd.isna(drive_link):
-            print(f"Skipping row {index + 2}: Missing required information")
-            continue
+    # Extract file IDs from the drive links of all rows at once
+    df['file_id'] = df['Download'].astype(str).apply(extract_file_id)
+    for video_name in df.loc[df['file_id'].isna(), 'video_name']:
+        print(f"Could not extract file ID from link for {sanitize_folder_name(video_name)}")
+    df = df.dropna(subset=['file_id'])
+
+    # Collect the downloads from each row
+    tasks = []
+    seen = set()
+    for row in df.itertuples(index=False):
+        video_name = sanitize_folder_name(row.video_name)
 
         # Create folder for video
         folder_path = os.path.join(base_dir, video_name)
         os.makedirs(folder_path, exist_ok=True)
 
-        # Extract file ID from drive link
-        file_id = extract_file_id(drive_link)
-        if not file_id:
-            print(f"Could not extract file ID from link for {video_name}")
+        # Skip duplicate rows, which would have two threads writing the same file
+        if (folder_path, row.file_id) in seen:
+            print(f"Skipping duplicate download of {row.file_id} for {video_name}")
             continue
+        seen.add((folder_path, row.file_id))
 
-        try:
-            # Get file metadata to determine original filename
-            file_metadata = service.files().get(fileId=file_id, fields='name').execute()
-            original_filename = file_metadata['name']
-            
-            # Create full output path
-            output_path = os.path.join(folder_path, original_filename)
-            
-            # Download the video
-            print(f"\nProcessing video: {video_name}")
-            if download_video(service, file_id, output_path):
-                print(f"Successfully downloaded {original_filename} to {folder_path}")
-            else:
-                print(f"Failed to download video for {video_name}")
-                
-        except Exception as e:
-            print(f"Error processing {video_name}: {str(e)}")
+        tasks.append((video_name, row.file_id, folder_path))
+
+    # Download the videos concurrently; each download is network-bound
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as pool:
+        for video_name, file_id, folder_path in tasks:
+            pool.submit(download_to_folder, creds, video_name, file_id, folder_path)
 
 if __name__ == '__main__':
     print("Starting video download and organization process...")